@@ -1,66 +1,241 @@
-"""Main ETL Pipeline - Simplified"""
+"""CSE Market Intelligence CLI
+
+Subcommands import their heavy dependencies (pandas, psycopg2, SQLAlchemy)
+lazily, so lightweight commands such as `status` start quickly.
+
+    python main.py run                     # full ETL pipeline (default)
+    python main.py backfill                # rebuild derived tables from stored prices
+    python main.py status                  # latest pipeline_execution_log row
+    python main.py setup-db
+    python main.py export vw_top_gainers --output gainers.csv
+    python main.py check-plans             # EXPLAIN suite for dashboard queries
+"""
+import argparse
 import sys
 from datetime import datetime
-from src.utils import setup_logging, get_logger
-from src.extractors import CSEDataExtractor
-from src.transformers import DataTransformer
-from src.loaders import DataLoader
+from src.utils import setup_logging, get_logger, log_context, new_run_id
 
-setup_logging()
 logger = get_logger(__name__)
 
+EXPORTABLE = (
+    'dim_stocks', 'dim_sectors', 'fact_daily_prices', 'fact_market_indices',
+    'fact_sector_performance', 'fact_market_summary', 'fact_anomalies',
+    'agg_rolling_stats', 'pipeline_execution_log',
+    'vw_latest_market_status', 'vw_top_gainers', 'vw_top_losers', 'vw_most_active',
+    'vw_stock_screener', 'vw_latest_anomalies'
+)
+
+
+def run_analytics(trade_dates, replay=False):
+    """Run post-load analytics for the given trade dates; failures are logged, not raised.
+
+    With replay=True the anomaly state is reset and rebuilt over trade_dates,
+    which must then cover the full price history.
+    """
+    from src.analytics import AnomalyDetector, CorrelationAnalyzer
+
+    try:
+        detector = AnomalyDetector()
+        if replay:
+            flagged = detector.replay(trade_dates)
+            logger.info(f"OK - Anomaly detection replayed ({flagged} flagged over {len(trade_dates)} days)")
+        else:
+            for trade_date in sorted(trade_dates):
+                flagged = detector.detect(trade_date)
+                logger.info(f"OK - Anomaly detection completed ({flagged} flagged for {trade_date})")
+    except Exception as e:
+        logger.warning(f"Anomaly detection failed: {e}")
+    try:
+        CorrelationAnalyzer().refresh()
+        logger.info("OK - Correlation cache refreshed")
+    except Exception as e:
+        logger.warning(f"Correlation refresh failed: {e}")
+
+
 def run_etl_pipeline():
     """Run the complete ETL pipeline"""
-    
-    print("=" * 60)
-    print("CSE Market Intelligence ETL Pipeline")
-    print("=" * 60)
-    
+    from src.extractors import CSEDataExtractor
+    from src.transformers import DataTransformer
+    from src.loaders import DataLoader
+
+    run_id = new_run_id()
+    logger.info("=" * 60)
+    logger.info(f"CSE Market Intelligence ETL Pipeline (run {run_id})")
+    logger.info("=" * 60)
+
     start_time = datetime.now()
-    
+
+    with log_context(run_id=run_id):
+        try:
+            # EXTRACT
+            with log_context(stage='extract'):
+                logger.info("[STEP 1/4] EXTRACTION")
+                extractor = CSEDataExtractor()
+                raw_data = extractor.extract_all_data()
+                logger.info("OK - Data extraction completed")
+
+            # TRANSFORM
+            with log_context(stage='transform'):
+                logger.info("[STEP 2/4] TRANSFORMATION")
+                transformer = DataTransformer()
+                transformed_data = transformer.transform_all_data(raw_data)
+                logger.info("OK - Data transformation completed")
+
+            # LOAD
+            with log_context(stage='load'):
+                logger.info("[STEP 3/4] LOADING")
+                loader = DataLoader()
+                result = loader.load_all_data(transformed_data)
+                logger.info("OK - Data loading completed")
+
+            # ANALYTICS
+            with log_context(stage='analytics'):
+                logger.info("[STEP 4/4] ANALYTICS")
+                run_analytics(transformed_data['stock_prices']['trade_date'].unique())
+
+            # SUMMARY
+            duration = (datetime.now() - start_time).total_seconds()
+
+            logger.info("=" * 60)
+            logger.info("ETL Pipeline Completed Successfully!")
+            logger.info(f"Duration: {duration:.2f} seconds")
+            logger.info(f"Records Loaded: {result['records']}")
+            logger.info("=" * 60)
+
+            return True
+
+        except Exception as e:
+            logger.error("=" * 60)
+            logger.error(f"ETL Pipeline FAILED: {e}", exc_info=True)
+            logger.error("=" * 60)
+            return False
+
+
+def cmd_run(args):
+    setup_logging()
+    return run_etl_pipeline()
+
+
+def cmd_backfill(args):
+    """Rebuild derived tables from all prices already in fact_daily_prices"""
+    from src.utils import get_db_connection
+    from src.loaders import RollingStatsUpdater
+
+    setup_logging()
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT DISTINCT trade_date FROM fact_daily_prices ORDER BY trade_date")
+        trade_dates = [row[0] for row in cursor.fetchall()]
+        cursor.close()
+    finally:
+        conn.close()
+
+    if not trade_dates:
+        logger.warning("No prices to backfill from")
+        return False
+
+    with log_context(run_id=new_run_id(), stage='backfill'):
+        logger.info(f"Backfilling {len(trade_dates)} trading days from {trade_dates[0]} to {trade_dates[-1]}")
+        with log_context(table='agg_rolling_stats'):
+            RollingStatsUpdater().rebuild_all()
+        # Anomaly state is cumulative, so it is replayed over the whole history
+        run_analytics(trade_dates, replay=True)
+    return True
+
+
+def cmd_status(args):
+    """Print the latest pipeline run; exit code reflects its status"""
+    from src.utils import get_db_connection
+
     try:
-        # EXTRACT
-        print("\n[STEP 1/3] EXTRACTION")
-        print("-" * 60)
-        extractor = CSEDataExtractor()
-        raw_data = extractor.extract_all_data()
-        print("OK - Data extraction completed")
-        
-        # TRANSFORM
-        print("\n[STEP 2/3] TRANSFORMATION")
-        print("-" * 60)
-        transformer = DataTransformer()
-        transformed_data = transformer.transform_all_data(raw_data)
-        print("OK - Data transformation completed")
-        
-        # LOAD
-        print("\n[STEP 3/3] LOADING")
-        print("-" * 60)
-        loader = DataLoader()
-        result = loader.load_all_data(transformed_data)
-        print("OK - Data loading completed")
-        
-        # SUMMARY
-        duration = (datetime.now() - start_time).total_seconds()
-        
-        print("\n" + "=" * 60)
-        print("ETL Pipeline Completed Successfully!")
-        print("=" * 60)
-        print(f"Duration: {duration:.2f} seconds")
-        print(f"Records Loaded: {result['records']}")
-        print("=" * 60)
-        
-        return True
-        
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT execution_date, pipeline_name, status, records_loaded,
+                   execution_time_seconds, error_message
+            FROM pipeline_execution_log
+            ORDER BY execution_id DESC
+            LIMIT 1
+        """)
+        row = cursor.fetchone()
+        cursor.close()
+        conn.close()
     except Exception as e:
-        print("\n" + "=" * 60)
-        print("ETL Pipeline FAILED")
-        print("=" * 60)
-        print(f"Error: {str(e)}")
-        logger.error(f"Pipeline failed: {e}", exc_info=True)
-        print("=" * 60)
+        print(f"ERROR: {e}")
+        return False
+
+    if row is None:
+        print("No pipeline runs recorded")
         return False
 
+    executed, name, status, records, seconds, error = row
+    print(f"{name}: {status} at {executed} ({records} records in {seconds}s)")
+    if error:
+        print(f"Error: {error}")
+    return status == 'SUCCESS'
+
+
+def cmd_setup_db(args):
+    from setup_database import setup_database
+    return setup_database()
+
+
+def cmd_export(args):
+    import pandas as pd
+    from src.utils import get_engine
+
+    output = args.output or f"{args.table}.csv"
+    df = pd.read_sql(f"SELECT * FROM {args.table}", get_engine())
+    df.to_csv(output, index=False)
+    print(f"Exported {len(df)} rows from {args.table} to {output}")
+    return True
+
+
+def cmd_check_plans(args):
+    """EXPLAIN every dashboard query on synthetic data; fails on seq scans or slow queries"""
+    from src.diagnostics import QueryPlanChecker
+
+    setup_logging()
+    checker = QueryPlanChecker(latency_budget_ms=args.budget_ms, stocks=args.stocks, days=args.days)
+    report = checker.run(baseline_path=args.baseline)
+    return report['passed']
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='main.py', description="CSE Market Intelligence")
+    subparsers = parser.add_subparsers(dest='command')
+
+    subparsers.add_parser('run', help="Run the full ETL pipeline").set_defaults(func=cmd_run)
+
+    subparsers.add_parser(
+        'backfill', help="Rebuild rolling stats and analytics from the full price history"
+    ).set_defaults(func=cmd_backfill)
+
+    subparsers.add_parser('status', help="Show the latest pipeline run").set_defaults(func=cmd_status)
+    subparsers.add_parser('setup-db', help="Create the database schema").set_defaults(func=cmd_setup_db)
+
+    export = subparsers.add_parser('export', help="Export a table or view to CSV")
+    export.add_argument('table', choices=EXPORTABLE)
+    export.add_argument('--output', help="CSV path (default: <table>.csv)")
+    export.set_defaults(func=cmd_export)
+
+    check_plans = subparsers.add_parser('check-plans', help="Query-plan regression suite and index advisor")
+    check_plans.add_argument('--baseline', help="Earlier report JSON to compare plan shapes against")
+    check_plans.add_argument('--budget-ms', type=float, help="Latency budget per query")
+    check_plans.add_argument('--stocks', type=int, help="Synthetic stock count")
+    check_plans.add_argument('--days', type=int, help="Synthetic trading days")
+    check_plans.set_defaults(func=cmd_check_plans)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    func = getattr(args, 'func', cmd_run)
+    return func(args)
+
+
 if __name__ == "__main__":
-    success = run_etl_pipeline()
+    success = main()
     sys.exit(0 if success else 1)
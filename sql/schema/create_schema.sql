@@ -1,5 +1,8 @@
 -- CSE MARKET INTELLIGENCE DATABASE SCHEMA - SIMPLIFIED
 -- Drop existing tables
+DROP TABLE IF EXISTS fact_anomalies CASCADE;
+DROP TABLE IF EXISTS agg_anomaly_state CASCADE;
+DROP TABLE IF EXISTS agg_rolling_stats CASCADE;
 DROP TABLE IF EXISTS fact_daily_prices CASCADE;
 DROP TABLE IF EXISTS fact_market_indices CASCADE;
 DROP TABLE IF EXISTS fact_sector_performance CASCADE;
@@ -95,11 +98,68 @@ CREATE TABLE pipeline_execution_log (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Rolling Statistics (one row per stock, updated incrementally by the loader)
+CREATE TABLE agg_rolling_stats (
+    stock_id INT PRIMARY KEY REFERENCES dim_stocks(stock_id),
+    as_of_date DATE NOT NULL,
+    obs_count INT NOT NULL DEFAULT 0,
+    last_close DECIMAL(12,2),
+    high_52w DECIMAL(12,2),
+    high_52w_date DATE,
+    low_52w DECIMAL(12,2),
+    low_52w_date DATE,
+    sum_volume_20 BIGINT DEFAULT 0,
+    sum_volume_50 BIGINT DEFAULT 0,
+    sum_volume_200 BIGINT DEFAULT 0,
+    sum_close_20 DECIMAL(18,2) DEFAULT 0,
+    sum_close_50 DECIMAL(18,2) DEFAULT 0,
+    sum_close_200 DECIMAL(18,2) DEFAULT 0,
+    close_20d_ago DECIMAL(12,2),
+    avg_volume_20 DECIMAL(18,2),
+    avg_volume_50 DECIMAL(18,2),
+    avg_volume_200 DECIMAL(18,2),
+    avg_close_20 DECIMAL(12,2),
+    avg_close_50 DECIMAL(12,2),
+    avg_close_200 DECIMAL(12,2),
+    return_20d_pct DECIMAL(10,2),
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Anomaly Detection State (running mean/variance per stock, latest two days kept)
+CREATE TABLE agg_anomaly_state (
+    stock_id INT REFERENCES dim_stocks(stock_id),
+    as_of_date DATE NOT NULL,
+    obs_count INT NOT NULL,
+    volume_mean DOUBLE PRECISION NOT NULL,
+    volume_var DOUBLE PRECISION NOT NULL,
+    return_mean DOUBLE PRECISION NOT NULL,
+    return_var DOUBLE PRECISION NOT NULL,
+    PRIMARY KEY (stock_id, as_of_date)
+);
+
+-- Anomalies
+CREATE TABLE fact_anomalies (
+    anomaly_id SERIAL PRIMARY KEY,
+    stock_id INT REFERENCES dim_stocks(stock_id),
+    trade_date DATE NOT NULL,
+    anomaly_type VARCHAR(30) NOT NULL,
+    observed_value DECIMAL(18,2),
+    expected_value DECIMAL(18,2),
+    z_score DECIMAL(8,2),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(stock_id, trade_date, anomaly_type)
+);
+
 -- Indexes
-CREATE INDEX idx_daily_prices_date ON fact_daily_prices(trade_date);
 CREATE INDEX idx_daily_prices_stock ON fact_daily_prices(stock_id);
 CREATE INDEX idx_market_indices_date ON fact_market_indices(trade_date);
-CREATE INDEX idx_sector_perf_date ON fact_sector_performance(trade_date);
+
+-- Composite indexes for dashboard queries (latest date, then the sort column);
+-- their trade_date prefix also serves plain trade_date lookups
+CREATE INDEX idx_daily_prices_date_change ON fact_daily_prices(trade_date, price_change_pct);
+CREATE INDEX idx_daily_prices_date_turnover ON fact_daily_prices(trade_date, turnover_lkr);
+CREATE INDEX idx_sector_perf_date_turnover ON fact_sector_performance(trade_date, total_turnover_lkr);
+CREATE INDEX idx_anomalies_date_zscore ON fact_anomalies(trade_date, (ABS(z_score)));
 
 -- Views
 CREATE OR REPLACE VIEW vw_latest_market_status AS
@@ -168,6 +228,42 @@ WHERE p.trade_date = (SELECT MAX(trade_date) FROM fact_daily_prices)
 ORDER BY p.turnover_lkr DESC
 LIMIT 10;
 
+CREATE OR REPLACE VIEW vw_stock_screener AS
+SELECT 
+    s.symbol,
+    s.company_name,
+    s.sector,
+    r.last_close,
+    r.high_52w,
+    r.low_52w,
+    ROUND((r.last_close / NULLIF(r.high_52w, 0) - 1) * 100, 2) AS pct_from_high_52w,
+    ROUND((r.last_close / NULLIF(r.low_52w, 0) - 1) * 100, 2) AS pct_from_low_52w,
+    r.avg_volume_20,
+    r.avg_volume_50,
+    r.avg_volume_200,
+    r.avg_close_20,
+    r.avg_close_50,
+    r.avg_close_200,
+    r.return_20d_pct,
+    r.as_of_date
+FROM agg_rolling_stats r
+JOIN dim_stocks s ON r.stock_id = s.stock_id;
+
+CREATE OR REPLACE VIEW vw_latest_anomalies AS
+SELECT 
+    s.symbol,
+    s.company_name,
+    s.sector,
+    a.anomaly_type,
+    a.observed_value,
+    a.expected_value,
+    a.z_score,
+    a.trade_date
+FROM fact_anomalies a
+JOIN dim_stocks s ON a.stock_id = s.stock_id
+WHERE a.trade_date = (SELECT MAX(trade_date) FROM fact_anomalies)
+ORDER BY ABS(a.z_score) DESC;
+
 -- Insert Sample Data
 INSERT INTO dim_sectors (sector_name) VALUES
 ('Banking, Finance and Insurance'),
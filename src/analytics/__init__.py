@@ -0,0 +1,6 @@
+"""Analytics package"""
+from .anomalies import AnomalyDetector
+from .correlations import CorrelationAnalyzer
+from .portfolio import PortfolioValuator
+
+__all__ = ['AnomalyDetector', 'CorrelationAnalyzer', 'PortfolioValuator']
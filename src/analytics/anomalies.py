@@ -0,0 +1,211 @@
+"""Anomaly Detection - Volume and price z-scores from incremental running statistics"""
+import math
+from src.utils import get_logger, get_db_connection, CONFIG
+
+logger = get_logger(__name__)
+
+METRICS = ('volume', 'return')
+
+# Stored z-scores are clamped to fit fact_anomalies.z_score DECIMAL(8,2)
+MAX_ABS_Z = 999999.99
+
+
+def update_running_stats(count, mean, var, value, span):
+    """One Welford-style update of a running mean and (population) variance.
+
+    Uses weight 1/n while warming up, which is exactly Welford's algorithm, then
+    settles at the exponential weight 2/(span+1) so old days fade out like a
+    rolling window without having to keep the window.
+    """
+    count += 1
+    weight = max(1.0 / count, 2.0 / (span + 1))
+    delta = value - mean
+    mean += weight * delta
+    var = (1 - weight) * (var + weight * delta * delta)
+    return count, mean, var
+
+
+class AnomalyDetector:
+    """Flags unusual volume spikes and price moves per symbol.
+
+    Keeps a small running state per stock in agg_anomaly_state, so each daily
+    run reads one state row per stock, scores the day against it, and writes
+    the updated state. Flags go to fact_anomalies. Only the latest two state
+    rows are kept, so detect() accepts the newest stored date (a re-run) or
+    later; older dates have to go through replay().
+    """
+
+    def __init__(self):
+        settings = CONFIG.get('anomalies', {})
+        self.z_threshold = settings.get('z_threshold', 3.0)
+        self.span = settings.get('span', 20)
+        self.min_observations = settings.get('min_observations', 10)
+        # Floors on the running std, so weeks of flat trading don't turn the next move into a huge z
+        self.min_std = {'volume': 0.1, 'return': 0.25, **settings.get('min_std', {})}
+
+    def metric_values(self, volume, change_pct):
+        """Values that are scored: log volume (volume is heavily skewed) and % change"""
+        return {
+            'volume': math.log1p(max(volume or 0, 0)),
+            'return': float(change_pct or 0)
+        }
+
+    def score(self, state, values):
+        """Score today's values against the prior state; returns list of flags"""
+        flags = []
+        if state is None or state['obs_count'] < self.min_observations:
+            return flags
+
+        for metric in METRICS:
+            std = max(math.sqrt(state[f'{metric}_var']), self.min_std[metric])
+            z = (values[metric] - state[f'{metric}_mean']) / std
+            z = max(-MAX_ABS_Z, min(MAX_ABS_Z, z))
+            if metric == 'volume' and z >= self.z_threshold:
+                flags.append(('VOLUME_SPIKE', z))
+            elif metric == 'return' and abs(z) >= self.z_threshold:
+                flags.append(('PRICE_JUMP' if z > 0 else 'PRICE_DROP', z))
+        return flags
+
+    def advance(self, state, values):
+        """Fold today's values into the running state"""
+        new = {'obs_count': state['obs_count'] if state else 0}
+        for metric in METRICS:
+            mean = state[f'{metric}_mean'] if state else 0.0
+            var = state[f'{metric}_var'] if state else 0.0
+            count, mean, var = update_running_stats(new['obs_count'], mean, var, values[metric], self.span)
+            new[f'{metric}_mean'], new[f'{metric}_var'] = mean, var
+        new['obs_count'] = count
+        return new
+
+    def detect(self, trade_date):
+        """Run detection for one trade date and persist state and flags"""
+        conn = None
+        try:
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            flagged = self._detect(cursor, trade_date)
+            conn.commit()
+            cursor.close()
+            conn.close()
+            return flagged
+        except Exception as e:
+            if conn:
+                conn.rollback()
+                conn.close()
+            logger.error(f"Error detecting anomalies: {e}")
+            raise
+
+    def replay(self, trade_dates):
+        """Reset all running state and re-detect over the given dates in order.
+
+        Pass the full price history: the state is cumulative, so starting part
+        way through would put every stock back into warm-up. The reset and all
+        days run in one transaction, so a failure leaves the old state intact.
+        """
+        trade_dates = sorted(set(trade_dates))
+        if not trade_dates:
+            return 0
+
+        logger.info(f"Replaying anomaly detection over {len(trade_dates)} trading days...")
+        conn = None
+        try:
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM agg_anomaly_state")
+            cursor.execute("DELETE FROM fact_anomalies WHERE trade_date >= %s", (trade_dates[0],))
+            flagged = sum(self._detect(cursor, trade_date) for trade_date in trade_dates)
+            conn.commit()
+            cursor.close()
+            conn.close()
+            return flagged
+        except Exception as e:
+            if conn:
+                conn.rollback()
+                conn.close()
+            logger.error(f"Error replaying anomaly detection: {e}")
+            raise
+
+    def _detect(self, cursor, trade_date):
+        """Score one trade date and write state and flags on cursor; the caller commits"""
+        logger.info(f"Detecting anomalies for {trade_date}...")
+
+        cursor.execute("SELECT MAX(as_of_date) FROM agg_anomaly_state")
+        latest = cursor.fetchone()[0]
+        if latest is not None and trade_date < latest:
+            raise ValueError(
+                f"Anomaly state is already at {latest}; use replay() to reprocess {trade_date}"
+            )
+
+        # Latest state strictly before the date, so re-runs of the same day are idempotent
+        cursor.execute("""
+            SELECT p.stock_id, p.volume, p.price_change_pct,
+                   st.obs_count, st.volume_mean, st.volume_var, st.return_mean, st.return_var
+            FROM fact_daily_prices p
+            LEFT JOIN LATERAL (
+                SELECT * FROM agg_anomaly_state a
+                WHERE a.stock_id = p.stock_id AND a.as_of_date < p.trade_date
+                ORDER BY a.as_of_date DESC
+                LIMIT 1
+            ) st ON TRUE
+            WHERE p.trade_date = %s
+        """, (trade_date,))
+        rows = cursor.fetchall()
+
+        states, anomalies = [], []
+        for stock_id, volume, change_pct, count, vol_mean, vol_var, ret_mean, ret_var in rows:
+            state = None
+            if count is not None:
+                state = {
+                    'obs_count': count,
+                    'volume_mean': vol_mean, 'volume_var': vol_var,
+                    'return_mean': ret_mean, 'return_var': ret_var
+                }
+            values = self.metric_values(volume, change_pct)
+
+            for anomaly_type, z in self.score(state, values):
+                metric = 'volume' if anomaly_type == 'VOLUME_SPIKE' else 'return'
+                observed = volume if metric == 'volume' else float(change_pct or 0)
+                expected = state[f'{metric}_mean']
+                if metric == 'volume':
+                    expected = math.expm1(expected)
+                anomalies.append((stock_id, trade_date, anomaly_type, observed, round(expected, 2), round(z, 2)))
+
+            new = self.advance(state, values)
+            states.append((stock_id, trade_date, new['obs_count'], new['volume_mean'], new['volume_var'],
+                           new['return_mean'], new['return_var']))
+
+        cursor.executemany("""
+            INSERT INTO agg_anomaly_state
+            (stock_id, as_of_date, obs_count, volume_mean, volume_var, return_mean, return_var)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            ON CONFLICT (stock_id, as_of_date)
+            DO UPDATE SET
+                obs_count = EXCLUDED.obs_count,
+                volume_mean = EXCLUDED.volume_mean,
+                volume_var = EXCLUDED.volume_var,
+                return_mean = EXCLUDED.return_mean,
+                return_var = EXCLUDED.return_var
+        """, states)
+
+        # Keep only the latest state and the one before it (needed to re-run the latest day)
+        cursor.execute("""
+            DELETE FROM agg_anomaly_state a
+            USING (
+                SELECT stock_id, as_of_date,
+                       ROW_NUMBER() OVER (PARTITION BY stock_id ORDER BY as_of_date DESC) AS rn
+                FROM agg_anomaly_state
+            ) ranked
+            WHERE a.stock_id = ranked.stock_id
+              AND a.as_of_date = ranked.as_of_date
+              AND ranked.rn > 2
+        """)
+
+        cursor.execute("DELETE FROM fact_anomalies WHERE trade_date = %s", (trade_date,))
+        cursor.executemany("""
+            INSERT INTO fact_anomalies
+            (stock_id, trade_date, anomaly_type, observed_value, expected_value, z_score)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, anomalies)
+
+        logger.info(f"Flagged {len(anomalies)} anomalies across {len(rows)} stocks")
+        return len(anomalies)
@@ -0,0 +1,237 @@
+"""Correlation Analytics - Cross-sectional return correlation and covariance"""
+import os
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from src.utils import get_logger, get_engine, CONFIG
+
+logger = get_logger(__name__)
+
+# Closes for the last :num_dates trading days up to :end_date (also EXPLAINed by check-plans)
+CLOSES_SQL = """
+WITH dates AS (
+    SELECT DISTINCT trade_date FROM fact_daily_prices
+    WHERE trade_date <= :end_date
+    ORDER BY trade_date DESC
+    LIMIT :num_dates
+)
+SELECT p.trade_date, s.symbol, s.sector, p.close_price
+FROM fact_daily_prices p
+JOIN dim_stocks s ON p.stock_id = s.stock_id
+WHERE p.trade_date IN (SELECT trade_date FROM dates)
+"""
+
+
+def window_sums(returns):
+    """Pairwise-complete sums over the rows of a (days x assets) return matrix.
+
+    Missing returns (NaN) are excluded per pair, so each entry [i, j] only
+    counts days on which both i and j traded. Every term is a plain sum over
+    rows, which is what lets the window be rolled by adding and subtracting rows.
+    """
+    returns = np.atleast_2d(returns)
+    mask = ~np.isnan(returns)
+    x = np.where(mask, returns, 0.0)
+    m = mask.astype(float)
+    return {
+        'n': m.T @ m,
+        'sx': x.T @ m,
+        'sxx': (x * x).T @ m,
+        'sxy': x.T @ x
+    }
+
+
+def covariance_from_sums(sums):
+    """Sample covariance and correlation matrices from window sums"""
+    n = sums['n']
+    sx, sxx, sxy = sums['sx'], sums['sxx'], sums['sxy']
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = (sxy - sx * sx.T / n) / (n - 1)
+        var = (sxx - sx * sx / n) / (n - 1)
+        corr = cov / np.sqrt(var * var.T)
+
+    cov[n < 2] = np.nan
+    corr[n < 2] = np.nan
+    return cov, np.clip(corr, -1.0, 1.0)
+
+
+class CorrelationAnalyzer:
+    """Computes daily-return correlation/covariance matrices across symbols and sectors.
+
+    Results are cached on disk per (trade_date, lookback). When the cache for
+    the previous trading day exists, the new day's return row is added to the
+    window sums and the oldest row subtracted instead of recomputing.
+    """
+
+    def __init__(self, cache_dir=None):
+        analytics = CONFIG.get('analytics', {})
+        self.cache_dir = os.path.join(cache_dir or analytics.get('cache_dir', 'data/cache'), 'correlations')
+        self.engine = get_engine()
+
+    def cache_path(self, trade_date, lookback):
+        return os.path.join(self.cache_dir, f"corr_{trade_date}_{lookback}.npz")
+
+    def latest_trade_date(self, before=None):
+        """Get latest trade date, optionally strictly before a date"""
+        query = "SELECT MAX(trade_date) AS d FROM fact_daily_prices"
+        params = {}
+        if before is not None:
+            query += " WHERE trade_date < :before"
+            params['before'] = before
+        return pd.read_sql(text(query), self.engine, params=params)['d'].iloc[0]
+
+    def load_closes(self, end_date, num_dates):
+        """Load a pivoted (dates x symbols) close matrix for the last num_dates trading days"""
+        df = pd.read_sql(text(CLOSES_SQL), self.engine, params={'end_date': end_date, 'num_dates': num_dates})
+        closes = df.pivot(index='trade_date', columns='symbol', values='close_price').sort_index().astype(float)
+        sectors = df.drop_duplicates('symbol').set_index('symbol')['sector'].fillna('Unknown')
+        return closes, sectors.reindex(closes.columns)
+
+    def add_sector_columns(self, returns, symbol_sectors, sector_names):
+        """Append equal-weighted sector return columns to a symbol return matrix"""
+        membership = (np.asarray(symbol_sectors)[:, None] == np.asarray(sector_names)[None, :]).astype(float)
+        mask = ~np.isnan(returns)
+        total = np.where(mask, returns, 0.0) @ membership
+        count = mask.astype(float) @ membership
+        with np.errstate(invalid='ignore', divide='ignore'):
+            sector_returns = np.where(count > 0, total / count, np.nan)
+        return np.hstack([returns, sector_returns])
+
+    def compute(self, trade_date, lookback):
+        """Full computation from the database (slow path)"""
+        closes, sectors = self.load_closes(trade_date, lookback + 1)
+        prices = closes.to_numpy()
+        returns = prices[1:] / prices[:-1] - 1
+
+        symbols = closes.columns.to_numpy(dtype=str)
+        symbol_sectors = sectors.to_numpy(dtype=str)
+        sector_names = np.unique(symbol_sectors)
+        window = self.add_sector_columns(returns, symbol_sectors, sector_names)
+
+        return {
+            'trade_date': np.array(str(trade_date)),
+            'symbols': symbols,
+            'symbol_sectors': symbol_sectors,
+            'sectors': sector_names,
+            'window': window,
+            'last_close': prices[-1] if len(prices) else np.full(len(symbols), np.nan),
+            **window_sums(window)
+        }
+
+    def advance(self, state, trade_date, lookback):
+        """Roll a cached state forward by one trading day (fast path).
+
+        Returns None if the symbol universe changed and a full compute is needed.
+        """
+        closes, _ = self.load_closes(trade_date, 1)
+        if not set(closes.columns) <= set(state['symbols']):
+            return None
+
+        new_close = closes.reindex(columns=state['symbols']).to_numpy()[-1]
+        returns = (new_close / state['last_close'] - 1)[None, :]
+        row = self.add_sector_columns(returns, state['symbol_sectors'], state['sectors'])
+
+        sums = {k: state[k] for k in ('n', 'sx', 'sxx', 'sxy')}
+        window = np.vstack([state['window'], row])
+        for k, v in window_sums(row).items():
+            sums[k] = sums[k] + v
+        if len(window) > lookback:
+            for k, v in window_sums(window[0]).items():
+                sums[k] = sums[k] - v
+            window = window[1:]
+
+        return {
+            **state,
+            'trade_date': np.array(str(trade_date)),
+            'window': window,
+            'last_close': new_close,
+            **sums
+        }
+
+    def load_cache(self, trade_date, lookback):
+        path = self.cache_path(trade_date, lookback)
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            return {k: data[k] for k in data.files}
+
+    def save_cache(self, state, trade_date, lookback):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        np.savez(self.cache_path(trade_date, lookback), **state)
+
+    def prune_cache(self, keep_from, lookback):
+        """Delete cache entries for a lookback dated before keep_from"""
+        if not os.path.isdir(self.cache_dir):
+            return 0
+        removed = 0
+        suffix = f"_{lookback}.npz"
+        for name in os.listdir(self.cache_dir):
+            if not (name.startswith('corr_') and name.endswith(suffix)):
+                continue
+            if name[len('corr_'):-len(suffix)] < str(keep_from):
+                os.remove(os.path.join(self.cache_dir, name))
+                removed += 1
+        return removed
+
+    def get_state(self, trade_date, lookback, use_cache=True):
+        """Get window state for a date: cache hit, incremental update, or full compute"""
+        state = self.load_cache(trade_date, lookback) if use_cache else None
+        if state is not None:
+            return state
+
+        previous_date = self.latest_trade_date(before=trade_date)
+        previous = self.load_cache(previous_date, lookback) if previous_date is not None else None
+        if previous is not None:
+            state = self.advance(previous, trade_date, lookback)
+            if state is not None:
+                logger.info(f"Correlations for {trade_date} (lookback {lookback}) updated incrementally")
+
+        if state is None:
+            logger.info(f"Computing correlations for {trade_date} (lookback {lookback})...")
+            state = self.compute(trade_date, lookback)
+
+        self.save_cache(state, trade_date, lookback)
+        return state
+
+    def get_matrices(self, trade_date=None, lookback=60):
+        """Get correlation and covariance matrices for symbols and sector aggregates.
+
+        Returns a dict of DataFrames: 'corr', 'cov', 'sector_corr', 'sector_cov',
+        plus 'n_obs' (pairwise observation counts for symbols) and 'trade_date'.
+        """
+        if trade_date is None:
+            trade_date = self.latest_trade_date()
+        state = self.get_state(trade_date, lookback)
+
+        cov, corr = covariance_from_sums(state)
+        num_symbols = len(state['symbols'])
+        symbols = list(state['symbols'])
+        sectors = list(state['sectors'])
+
+        def block(matrix, labels, part):
+            sl = slice(0, num_symbols) if part == 'symbols' else slice(num_symbols, None)
+            return pd.DataFrame(matrix[sl, sl], index=labels, columns=labels)
+
+        return {
+            'trade_date': trade_date,
+            'corr': block(corr, symbols, 'symbols'),
+            'cov': block(cov, symbols, 'symbols'),
+            'sector_corr': block(corr, sectors, 'sectors'),
+            'sector_cov': block(cov, sectors, 'sectors'),
+            'n_obs': block(state['n'], symbols, 'symbols')
+        }
+
+    def refresh(self, trade_date=None, lookbacks=None):
+        """Compute and cache matrices for the configured lookbacks (run after ETL)"""
+        lookbacks = lookbacks or CONFIG.get('analytics', {}).get('correlation_lookbacks', [60])
+        if trade_date is None:
+            trade_date = self.latest_trade_date()
+        # Only the previous day's entry is read by the incremental path, so older ones can go
+        keep_from = self.latest_trade_date(before=trade_date) or trade_date
+        for lookback in lookbacks:
+            # The day's prices may have just been reloaded, so never trust its own cache entry
+            self.get_state(trade_date, lookback, use_cache=False)
+            self.prune_cache(keep_from, lookback)
+        logger.info(f"Correlation cache refreshed for {trade_date}: lookbacks {list(lookbacks)}")
+        return len(lookbacks)
@@ -0,0 +1,207 @@
+"""Portfolio Analytics - Vectorized valuation and P&L over price history"""
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from src.utils import get_logger, get_engine
+
+logger = get_logger(__name__)
+
+TRANSACTION_COLUMNS = ['portfolio_id', 'symbol', 'trade_date', 'quantity', 'price', 'fees']
+
+# Closes for :symbols between :start_date and :end_date, plus each symbol's last
+# close before :start_date to seed the forward fill (also EXPLAINed by check-plans)
+PRICES_SQL = """
+SELECT p.trade_date, s.symbol, p.close_price
+FROM fact_daily_prices p
+JOIN dim_stocks s ON p.stock_id = s.stock_id
+WHERE s.symbol = ANY(:symbols)
+  AND p.trade_date BETWEEN :start_date AND :end_date
+UNION ALL
+SELECT * FROM (
+    SELECT DISTINCT ON (p.stock_id) p.trade_date, s.symbol, p.close_price
+    FROM fact_daily_prices p
+    JOIN dim_stocks s ON p.stock_id = s.stock_id
+    WHERE s.symbol = ANY(:symbols)
+      AND p.trade_date < :start_date
+    ORDER BY p.stock_id, p.trade_date DESC
+) seed
+"""
+
+
+class PortfolioValuator:
+    """Values many portfolios at once against fact_daily_prices.
+
+    Transactions have columns portfolio_id, symbol, trade_date, quantity
+    (positive buy, negative sell) and optionally price (defaults to that day's
+    close) and fees. Positions are held as a (portfolios x symbols) matrix and
+    rolled over a (dates x symbols) price matrix, so each trading day costs one
+    matrix-vector product regardless of how many portfolios there are.
+    Realized P&L uses average cost; same-day buys are applied before sells.
+    """
+
+    def __init__(self, engine=None):
+        self.engine = engine
+
+    def load_prices(self, symbols, start_date, end_date):
+        """Load a forward-filled (dates x symbols) close matrix.
+
+        Each symbol is seeded with its last close on or before start_date, so
+        holdings that did not trade on the first day are still valued.
+        """
+        if self.engine is None:
+            self.engine = get_engine()
+
+        df = pd.read_sql(text(PRICES_SQL), self.engine, params={
+            'symbols': list(symbols), 'start_date': start_date, 'end_date': end_date
+        })
+        prices = df.pivot(index='trade_date', columns='symbol', values='close_price').sort_index()
+        prices = prices.reindex(columns=sorted(symbols)).astype(float).ffill()
+        # Seed rows only carry a close forward; the matrix itself starts at start_date
+        prices = prices[prices.index >= pd.to_datetime(start_date).date()]
+        return prices.dropna(axis=1, how='all')
+
+    @staticmethod
+    def holdings_to_transactions(holdings, as_of):
+        """Convert a holdings snapshot (portfolio_id, symbol, quantity, avg_cost) to opening transactions"""
+        txns = holdings.rename(columns={'avg_cost': 'price'}).copy()
+        txns['trade_date'] = pd.to_datetime(as_of).date()
+        return txns
+
+    def value(self, transactions, start_date=None, end_date=None):
+        """Value portfolios from the database price history"""
+        txns = self.prepare(transactions)
+        start_date = start_date or txns['trade_date'].min()
+        end_date = end_date or pd.Timestamp.today().date()
+        prices = self.load_prices(txns['symbol'].unique(), start_date, end_date)
+        return self.value_with_prices(txns, prices, prepared=True)
+
+    def prepare(self, transactions):
+        """Normalize transaction columns and types"""
+        txns = transactions.copy()
+        if 'price' not in txns:
+            txns['price'] = np.nan
+        if 'fees' not in txns:
+            txns['fees'] = 0.0
+        txns['trade_date'] = pd.to_datetime(txns['trade_date']).dt.date
+        txns['quantity'] = txns['quantity'].astype(float)
+        txns['price'] = txns['price'].astype(float)
+        txns['fees'] = txns['fees'].fillna(0).astype(float)
+        return txns[TRANSACTION_COLUMNS]
+
+    def value_with_prices(self, transactions, prices, prepared=False):
+        """Value portfolios against a (dates x symbols) close DataFrame.
+
+        Returns a dict of (dates x portfolios) DataFrames: market_value,
+        cost_basis, realized_pnl, unrealized_pnl, total_pnl, returns,
+        cumulative_return, drawdown, plus a per-portfolio 'summary'.
+        Transactions without a usable price (unknown symbol, or dated before
+        the symbol's first close with no explicit price) are skipped. A
+        position in a symbol that has no close yet is left out of both market
+        value and flows until its first close, rather than valued at zero.
+        """
+        txns = transactions if prepared else self.prepare(transactions)
+        dates = prices.index.to_numpy()
+        price_matrix = prices.to_numpy(dtype=float)
+        portfolios = np.sort(txns['portfolio_id'].unique())
+        num_dates, num_portfolios, num_symbols = len(dates), len(portfolios), prices.shape[1]
+
+        # Map every transaction onto matrix coordinates; non-trading days roll to the next session
+        p_idx = np.searchsorted(portfolios, txns['portfolio_id'].to_numpy())
+        s_idx = prices.columns.get_indexer(txns['symbol'])
+        d_idx = np.searchsorted(dates, txns['trade_date'].to_numpy())
+        covered = (s_idx >= 0) & (d_idx < num_dates)
+        fill = txns['price'].to_numpy(copy=True)
+        fill[covered] = np.where(
+            np.isnan(fill[covered]), price_matrix[d_idx[covered], s_idx[covered]], fill[covered]
+        )
+        valid = covered & ~np.isnan(fill)
+        if not valid.all():
+            logger.warning(f"Skipping {(~valid).sum()} transactions without price coverage")
+        p_idx, s_idx, d_idx = p_idx[valid], s_idx[valid], d_idx[valid]
+
+        qty = txns['quantity'].to_numpy()[valid]
+        fill = fill[valid]
+        fees = txns['fees'].to_numpy()[valid]
+        is_buy = qty > 0
+
+        positions = np.zeros((num_portfolios, num_symbols))
+        cost = np.zeros((num_portfolios, num_symbols))
+        realized = np.zeros(num_portfolios)
+        total_cost = np.zeros(num_portfolios)
+        shape = (num_dates, num_portfolios)
+        market_value, cost_basis, realized_pnl, flows = (np.zeros(shape) for _ in range(4))
+
+        # Cash flows count from the day the symbol is first priced, matching when it enters market value
+        priced = ~np.isnan(price_matrix)
+        first_priced = np.where(priced.any(axis=0), priced.argmax(axis=0) if num_dates else 0, num_dates)
+        flow_day = np.maximum(d_idx, first_priced[s_idx])
+        counted = flow_day < num_dates
+        np.add.at(flows, (flow_day[counted], p_idx[counted]), (qty * fill + fees)[counted])
+
+        valued_prices = np.nan_to_num(price_matrix)
+        order = np.argsort(d_idx, kind='stable')
+        bounds = np.searchsorted(d_idx[order], np.arange(num_dates + 1))
+
+        for t in range(num_dates):
+            day = order[bounds[t]:bounds[t + 1]]
+            if len(day):
+                buys, sells = day[is_buy[day]], day[~is_buy[day]]
+
+                bought = qty[buys] * fill[buys] + fees[buys]
+                np.add.at(positions, (p_idx[buys], s_idx[buys]), qty[buys])
+                np.add.at(cost, (p_idx[buys], s_idx[buys]), bought)
+                np.add.at(total_cost, p_idx[buys], bought)
+
+                # Sells are valued at the post-buy average cost of each position
+                held = positions[p_idx[sells], s_idx[sells]]
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    avg_cost = np.where(held != 0, cost[p_idx[sells], s_idx[sells]] / held, 0.0)
+                sold = -qty[sells]
+                sold_cost = sold * avg_cost
+                proceeds = sold * fill[sells] - fees[sells]
+                np.add.at(realized, p_idx[sells], proceeds - sold_cost)
+                np.add.at(cost, (p_idx[sells], s_idx[sells]), -sold_cost)
+                np.add.at(total_cost, p_idx[sells], -sold_cost)
+                np.add.at(positions, (p_idx[sells], s_idx[sells]), -sold)
+
+            market_value[t] = positions @ valued_prices[t]
+            cost_basis[t] = total_cost
+            realized_pnl[t] = realized
+
+        unrealized_pnl = market_value - cost_basis
+        returns = self.daily_returns(market_value, flows)
+        wealth = np.cumprod(1 + returns, axis=0)
+        drawdown = wealth / np.maximum.accumulate(wealth, axis=0) - 1
+
+        def frame(values):
+            return pd.DataFrame(values, index=prices.index, columns=portfolios)
+
+        result = {
+            'market_value': frame(market_value),
+            'cost_basis': frame(cost_basis),
+            'realized_pnl': frame(realized_pnl),
+            'unrealized_pnl': frame(unrealized_pnl),
+            'total_pnl': frame(realized_pnl + unrealized_pnl),
+            'returns': frame(returns),
+            'cumulative_return': frame(wealth - 1),
+            'drawdown': frame(drawdown)
+        }
+        result['summary'] = pd.DataFrame({
+            'market_value': market_value[-1] if num_dates else 0.0,
+            'realized_pnl': realized_pnl[-1] if num_dates else 0.0,
+            'unrealized_pnl': unrealized_pnl[-1] if num_dates else 0.0,
+            'cumulative_return_pct': (wealth[-1] - 1) * 100 if num_dates else 0.0,
+            'max_drawdown_pct': drawdown.min(axis=0) * 100 if num_dates else 0.0
+        }, index=pd.Index(portfolios, name='portfolio_id'))
+
+        logger.info(f"Valued {num_portfolios} portfolios over {num_dates} trading days")
+        return result
+
+    @staticmethod
+    def daily_returns(market_value, flows):
+        """Time-weighted daily returns with net buys treated as start-of-day flows"""
+        previous = np.vstack([np.zeros((1, market_value.shape[1])), market_value[:-1]])
+        denominator = previous + np.maximum(flows, 0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            returns = (market_value - previous - flows) / denominator
+        return np.where(denominator > 0, returns, 0.0)
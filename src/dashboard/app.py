@@ -5,8 +5,11 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../.
 
 import streamlit as st
 import pandas as pd
+import numpy as np
 from datetime import datetime
-from src.utils import get_engine
+from src.utils import get_engine, CONFIG
+from src.analytics import CorrelationAnalyzer, PortfolioValuator
+from src.dashboard import queries
 
 st.set_page_config(page_title="CSE Market Intelligence", page_icon="📈", layout="wide")
 st.title("📈 CSE Market Intelligence Dashboard")
@@ -19,14 +22,14 @@ engine = get_db_engine()
 
 # Sidebar
 st.sidebar.title("Navigation")
-page = st.sidebar.radio("Go to", ["🏠 Market Overview", "📊 Stock Explorer", "🏭 Sectors"])
+page = st.sidebar.radio("Go to", ["🏠 Market Overview", "📊 Stock Explorer", "🔎 Screener", "🏭 Sectors", "🔗 Correlations", "💼 Portfolios"])
 
 if st.sidebar.button("🔄 Refresh"):
     st.cache_data.clear()
     st.rerun()
 
 try:
-    last_update = pd.read_sql("SELECT MAX(trade_date) as last_date FROM fact_daily_prices", engine)['last_date'].iloc[0]
+    last_update = pd.read_sql(queries.LAST_UPDATE, engine)['last_date'].iloc[0]
     st.sidebar.info(f"**Last Update:** {last_update}")
 except:
     st.sidebar.info("**Last Update:** N/A")
@@ -36,7 +39,7 @@ if page == "🏠 Market Overview":
     st.header("Market Overview")
     
     try:
-        indices = pd.read_sql("SELECT * FROM vw_latest_market_status ORDER BY index_name", engine)
+        indices = pd.read_sql(queries.MARKET_STATUS, engine)
         
         if not indices.empty:
             cols = st.columns(len(indices))
@@ -60,20 +63,29 @@ if page == "🏠 Market Overview":
         
         with col1:
             st.markdown("**Top Gainers**")
-            gainers = pd.read_sql("SELECT * FROM vw_top_gainers LIMIT 5", engine)
+            gainers = pd.read_sql(queries.TOP_GAINERS, engine)
             if not gainers.empty:
                 st.dataframe(gainers[['symbol', 'company_name', 'close_price', 'price_change_pct']], hide_index=True)
         
         with col2:
             st.markdown("**Top Losers**")
-            losers = pd.read_sql("SELECT * FROM vw_top_losers LIMIT 5", engine)
+            losers = pd.read_sql(queries.TOP_LOSERS, engine)
             if not losers.empty:
                 st.dataframe(losers[['symbol', 'company_name', 'close_price', 'price_change_pct']], hide_index=True)
         
         st.subheader("Most Active")
-        active = pd.read_sql("SELECT * FROM vw_most_active LIMIT 10", engine)
+        active = pd.read_sql(queries.MOST_ACTIVE, engine)
         if not active.empty:
             st.dataframe(active[['symbol', 'company_name', 'volume', 'turnover_lkr']], hide_index=True)
+        
+        st.subheader("Alerts")
+        alerts = pd.read_sql(queries.ALERTS, engine)
+        if not alerts.empty:
+            st.caption(f"Unusual activity on {alerts['trade_date'].iloc[0]}")
+            st.dataframe(alerts[['symbol', 'company_name', 'anomaly_type', 'observed_value',
+                                 'expected_value', 'z_score']], hide_index=True)
+        else:
+            st.info("No anomalies flagged")
     
     except Exception as e:
         st.error(f"Error: {e}")
@@ -83,14 +95,7 @@ elif page == "📊 Stock Explorer":
     st.header("Stock Explorer")
     
     try:
-        query = """
-        SELECT s.symbol, s.company_name, s.sector, p.close_price, p.price_change_pct, p.volume
-        FROM dim_stocks s
-        LEFT JOIN fact_daily_prices p ON s.stock_id = p.stock_id
-        WHERE p.trade_date = (SELECT MAX(trade_date) FROM fact_daily_prices)
-        ORDER BY p.turnover_lkr DESC
-        """
-        stocks = pd.read_sql(query, engine)
+        stocks = pd.read_sql(queries.STOCK_EXPLORER, engine)
         
         if not stocks.empty:
             col1, col2 = st.columns(2)
@@ -111,19 +116,51 @@ elif page == "📊 Stock Explorer":
     except Exception as e:
         st.error(f"Error: {e}")
 
+# PAGE: SCREENER
+elif page == "🔎 Screener":
+    st.header("Stock Screener")
+    
+    try:
+        screener = pd.read_sql(queries.SCREENER, engine)
+        
+        if not screener.empty:
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                near = st.selectbox("Near", ["Any", "52-Week High", "52-Week Low"])
+                within_pct = st.number_input("Within %", value=5.0, min_value=0.0)
+            with col2:
+                volume_window = st.selectbox("Avg Volume Window", [20, 50, 200])
+                min_avg_volume = st.number_input("Min Avg Volume", value=0, min_value=0)
+            with col3:
+                min_return = st.number_input("Min 20-Day Return %", value=-100.0)
+            
+            filtered = screener.copy()
+            if near == "52-Week High":
+                filtered = filtered[filtered['pct_from_high_52w'] >= -within_pct]
+            elif near == "52-Week Low":
+                filtered = filtered[filtered['pct_from_low_52w'] <= within_pct]
+            filtered = filtered[filtered[f'avg_volume_{volume_window}'] >= min_avg_volume]
+            filtered = filtered[filtered['return_20d_pct'].fillna(0) >= min_return]
+            
+            st.subheader(f"Results ({len(filtered)} stocks)")
+            st.dataframe(
+                filtered[['symbol', 'company_name', 'sector', 'last_close', 'high_52w', 'low_52w',
+                          'pct_from_high_52w', 'pct_from_low_52w', f'avg_volume_{volume_window}',
+                          'avg_close_20', 'avg_close_50', 'avg_close_200', 'return_20d_pct']],
+                hide_index=True, use_container_width=True
+            )
+        else:
+            st.info("No rolling statistics yet - run the ETL pipeline first")
+    
+    except Exception as e:
+        st.error(f"Error: {e}")
+
 # PAGE: SECTORS
 elif page == "🏭 Sectors":
     st.header("Sector Analysis")
     
     try:
-        query = """
-        SELECT s.sector_name, sp.sector_index, sp.sector_change_pct, sp.total_turnover_lkr
-        FROM fact_sector_performance sp
-        JOIN dim_sectors s ON sp.sector_id = s.sector_id
-        WHERE sp.trade_date = (SELECT MAX(trade_date) FROM fact_sector_performance)
-        ORDER BY sp.total_turnover_lkr DESC
-        """
-        sectors = pd.read_sql(query, engine)
+        sectors = pd.read_sql(queries.SECTORS, engine)
         
         if not sectors.empty:
             st.dataframe(sectors, hide_index=True, use_container_width=True)
@@ -132,5 +169,80 @@ elif page == "🏭 Sectors":
     except Exception as e:
         st.error(f"Error: {e}")
 
+# PAGE: CORRELATIONS
+elif page == "🔗 Correlations":
+    st.header("Return Correlations")
+    
+    @st.cache_data(ttl=3600)
+    def get_correlations(lookback):
+        return CorrelationAnalyzer().get_matrices(lookback=lookback)
+    
+    try:
+        import plotly.express as px
+        
+        lookbacks = CONFIG.get('analytics', {}).get('correlation_lookbacks', [60])
+        col1, col2 = st.columns(2)
+        with col1:
+            lookback = st.selectbox("Lookback (trading days)", lookbacks)
+        with col2:
+            level = st.radio("Level", ["Symbols", "Sectors"], horizontal=True)
+        
+        result = get_correlations(lookback)
+        corr = result['corr'] if level == "Symbols" else result['sector_corr']
+        cov = result['cov'] if level == "Symbols" else result['sector_cov']
+        
+        if corr.empty:
+            st.info("Not enough price history yet")
+        else:
+            st.caption(f"As of {result['trade_date']}")
+            fig = px.imshow(corr, zmin=-1, zmax=1, color_continuous_scale='RdBu_r', aspect='auto')
+            st.plotly_chart(fig, use_container_width=True)
+            
+            st.subheader("Most Correlated Pairs")
+            upper = np.triu(np.ones(corr.shape, dtype=bool), k=1)
+            pairs = corr.where(upper).stack().dropna().rename('correlation').reset_index()
+            pairs.columns = ['first', 'second', 'correlation']
+            st.dataframe(pairs.sort_values('correlation', ascending=False).head(10), hide_index=True)
+            
+            with st.expander("Covariance Matrix"):
+                st.dataframe(cov, use_container_width=True)
+    
+    except Exception as e:
+        st.error(f"Error: {e}")
+
+# PAGE: PORTFOLIOS
+elif page == "💼 Portfolios":
+    st.header("Portfolio Valuation")
+    st.caption("Upload transactions as CSV with columns: portfolio_id, symbol, trade_date, quantity "
+               "(negative for sells), and optionally price and fees")
+    
+    uploaded = st.file_uploader("Transactions CSV", type="csv")
+    
+    try:
+        if uploaded is not None:
+            transactions = pd.read_csv(uploaded)
+            result = PortfolioValuator(engine).value(transactions)
+            summary = result['summary']
+            
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("Portfolios", f"{len(summary):,}")
+            col2.metric("Market Value (LKR)", f"{summary['market_value'].sum():,.0f}")
+            col3.metric("Realized P&L", f"{summary['realized_pnl'].sum():,.0f}")
+            col4.metric("Unrealized P&L", f"{summary['unrealized_pnl'].sum():,.0f}")
+            
+            st.subheader("Summary")
+            st.dataframe(summary.reset_index(), hide_index=True, use_container_width=True)
+            
+            selected = st.selectbox("Portfolio", summary.index.tolist())
+            history = pd.DataFrame({
+                'market_value': result['market_value'][selected],
+                'total_pnl': result['total_pnl'][selected]
+            })
+            st.line_chart(history)
+            st.area_chart(result['drawdown'][selected] * 100)
+    
+    except Exception as e:
+        st.error(f"Error: {e}")
+
 st.markdown("---")
 st.markdown(f"<div style='text-align:center;color:gray'>CSE Market Intelligence © {datetime.now().year}</div>", unsafe_allow_html=True)
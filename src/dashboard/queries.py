@@ -0,0 +1,43 @@
+"""Dashboard SQL - shared by the Streamlit app and the query-plan checker"""
+
+LAST_UPDATE = "SELECT MAX(trade_date) as last_date FROM fact_daily_prices"
+
+MARKET_STATUS = "SELECT * FROM vw_latest_market_status ORDER BY index_name"
+
+TOP_GAINERS = "SELECT * FROM vw_top_gainers LIMIT 5"
+
+TOP_LOSERS = "SELECT * FROM vw_top_losers LIMIT 5"
+
+MOST_ACTIVE = "SELECT * FROM vw_most_active LIMIT 10"
+
+ALERTS = "SELECT * FROM vw_latest_anomalies"
+
+STOCK_EXPLORER = """
+SELECT s.symbol, s.company_name, s.sector, p.close_price, p.price_change_pct, p.volume
+FROM dim_stocks s
+LEFT JOIN fact_daily_prices p ON s.stock_id = p.stock_id
+WHERE p.trade_date = (SELECT MAX(trade_date) FROM fact_daily_prices)
+ORDER BY p.turnover_lkr DESC
+"""
+
+SCREENER = "SELECT * FROM vw_stock_screener"
+
+SECTORS = """
+SELECT s.sector_name, sp.sector_index, sp.sector_change_pct, sp.total_turnover_lkr
+FROM fact_sector_performance sp
+JOIN dim_sectors s ON sp.sector_id = s.sector_id
+WHERE sp.trade_date = (SELECT MAX(trade_date) FROM fact_sector_performance)
+ORDER BY sp.total_turnover_lkr DESC
+"""
+
+ALL_QUERIES = {
+    'last_update': LAST_UPDATE,
+    'market_status': MARKET_STATUS,
+    'top_gainers': TOP_GAINERS,
+    'top_losers': TOP_LOSERS,
+    'most_active': MOST_ACTIVE,
+    'alerts': ALERTS,
+    'stock_explorer': STOCK_EXPLORER,
+    'screener': SCREENER,
+    'sectors': SECTORS
+}
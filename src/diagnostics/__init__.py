@@ -0,0 +1,4 @@
+"""Diagnostics package"""
+from .query_plans import QueryPlanChecker
+
+__all__ = ['QueryPlanChecker']
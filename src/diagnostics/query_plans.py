@@ -0,0 +1,316 @@
+"""Query Plan Checker - EXPLAIN regression suite and index advisor for dashboard queries"""
+import json
+import os
+import re
+from datetime import date, datetime, timedelta
+from src.utils import get_logger, get_db_connection, CONFIG
+from src.dashboard.queries import ALL_QUERIES
+from src.analytics.correlations import CLOSES_SQL
+from src.analytics.portfolio import PRICES_SQL
+
+logger = get_logger(__name__)
+
+VIEWS = (
+    'vw_latest_market_status', 'vw_top_gainers', 'vw_top_losers',
+    'vw_most_active', 'vw_stock_screener', 'vw_latest_anomalies'
+)
+
+SCAN_NODES = ('Seq Scan', 'Index Scan', 'Index Only Scan', 'Bitmap Heap Scan', 'Bitmap Index Scan')
+
+SYNTHETIC_DATA_SQL = """
+CREATE TEMP TABLE synthetic_dates ON COMMIT DROP AS
+SELECT d::date AS trade_date
+FROM generate_series(CURRENT_DATE - (%(days)s * 7 / 5), CURRENT_DATE, INTERVAL '1 day') d
+WHERE EXTRACT(ISODOW FROM d) < 6;
+
+INSERT INTO dim_stocks (symbol, company_name, sector)
+SELECT 'SYN' || LPAD(i::text, 5, '0') || '.N0000',
+       'Synthetic Company ' || i,
+       (ARRAY(SELECT sector_name FROM dim_sectors ORDER BY sector_id))[1 + i %% GREATEST((SELECT COUNT(*) FROM dim_sectors), 1)]
+FROM generate_series(1, %(stocks)s) i;
+
+INSERT INTO fact_daily_prices
+(stock_id, trade_date, open_price, high_price, low_price, close_price,
+ volume, turnover_lkr, price_change, price_change_pct)
+SELECT s.stock_id, d.trade_date,
+       ROUND((10 + random() * 990)::numeric, 2),
+       ROUND((10 + random() * 990)::numeric, 2),
+       ROUND((10 + random() * 990)::numeric, 2),
+       ROUND((10 + random() * 990)::numeric, 2),
+       (random() * 2000000)::int,
+       ROUND((random() * 20000000)::numeric, 2),
+       ROUND((random() * 20 - 10)::numeric, 2),
+       ROUND((random() * 10 - 5)::numeric, 2)
+FROM dim_stocks s
+CROSS JOIN synthetic_dates d
+WHERE s.symbol LIKE 'SYN%%';
+
+INSERT INTO fact_market_indices (index_name, trade_date, index_value, index_change, index_change_pct, volume, turnover_lkr)
+SELECT i.name, d.trade_date, 1000 + random() * 10000, random() * 100 - 50, random() * 2 - 1,
+       (random() * 1e8)::bigint, random() * 1e10
+FROM synthetic_dates d
+CROSS JOIN (VALUES ('ASPI'), ('S&P SL20')) AS i(name)
+ON CONFLICT (index_name, trade_date) DO NOTHING;
+
+INSERT INTO fact_market_summary
+(trade_date, total_trades, total_volume, total_turnover_lkr, advancing_stocks, declining_stocks, unchanged_stocks)
+SELECT trade_date, (random() * 10000)::int, (random() * 1e8)::bigint, random() * 1e10,
+       (random() * 200)::int, (random() * 200)::int, (random() * 50)::int
+FROM synthetic_dates
+ON CONFLICT (trade_date) DO NOTHING;
+
+INSERT INTO fact_sector_performance
+(sector_id, trade_date, sector_index, sector_change_pct, total_volume, total_turnover_lkr, advancing_count, declining_count)
+SELECT s.sector_id, d.trade_date, 1000 + random() * 4000, random() * 4 - 2,
+       (random() * 5000000)::bigint, random() * 5e7, (random() * 25)::int, (random() * 25)::int
+FROM dim_sectors s
+CROSS JOIN synthetic_dates d
+ON CONFLICT (sector_id, trade_date) DO NOTHING;
+
+INSERT INTO fact_anomalies (stock_id, trade_date, anomaly_type, observed_value, expected_value, z_score)
+SELECT p.stock_id, p.trade_date, 'VOLUME_SPIKE', p.volume, p.volume / 4, 3 + random() * 3
+FROM fact_daily_prices p
+JOIN dim_stocks s ON p.stock_id = s.stock_id
+WHERE s.symbol LIKE 'SYN%%' AND random() < 0.01
+ON CONFLICT (stock_id, trade_date, anomaly_type) DO NOTHING;
+
+INSERT INTO agg_rolling_stats (stock_id, as_of_date, obs_count, last_close, high_52w, low_52w,
+                               avg_volume_20, avg_close_20, return_20d_pct)
+SELECT stock_id, CURRENT_DATE, %(days)s, 100, 150, 50, 500000, 100, random() * 20 - 10
+FROM dim_stocks
+WHERE symbol LIKE 'SYN%%'
+ON CONFLICT (stock_id) DO NOTHING;
+
+ANALYZE dim_stocks;
+ANALYZE fact_daily_prices;
+ANALYZE fact_market_indices;
+ANALYZE fact_market_summary;
+ANALYZE fact_sector_performance;
+ANALYZE fact_anomalies;
+ANALYZE agg_rolling_stats;
+"""
+
+
+def pyformat(sql):
+    """Rewrite SQLAlchemy :name binds as psycopg2 %(name)s placeholders (leaves ::casts alone)"""
+    return re.sub(r"(?<![:\w]):(\w+)", r"%(\1)s", sql.replace('%', '%%'))
+
+
+def walk(node):
+    """Yield every node of an EXPLAIN JSON plan tree"""
+    yield node
+    for child in node.get('Plans', []):
+        yield from walk(child)
+
+
+def plan_shape(node):
+    """Compact plan shape, e.g. 'Limit>Sort>Hash Join(Seq Scan:fact_daily_prices,Hash>...)'"""
+    label = node['Node Type']
+    if 'Relation Name' in node:
+        label += f":{node['Relation Name']}"
+    children = [plan_shape(child) for child in node.get('Plans', [])]
+    if len(children) == 1:
+        return f"{label}>{children[0]}"
+    if children:
+        return f"{label}({','.join(children)})"
+    return label
+
+
+def condition_columns(condition, alias):
+    """Split a plan condition into (equality columns, range columns) for one alias"""
+    equality, ranges = [], []
+    pattern = rf"\(?(?:{re.escape(alias)}\.)?(\w+)\s*(=|<=|>=|<|>)\s"
+    for column, op in re.findall(pattern, condition or ''):
+        target = equality if op == '=' else ranges
+        if column not in target:
+            target.append(column)
+    return equality, ranges
+
+
+class QueryPlanChecker:
+    """Runs EXPLAIN (ANALYZE, BUFFERS) for every dashboard query, view and analytics loader on synthetic data.
+
+    Synthetic rows are inserted into the configured database inside a single
+    transaction that is always rolled back, so point it at a development
+    database. A query fails when it sequentially scans a table outside the
+    allow-list or its best execution time exceeds the latency budget.
+    Parameterized analytics queries run with representative values: the
+    longest configured correlation lookback, and a sample of synthetic
+    symbols over a multi-year portfolio range.
+    """
+
+    def __init__(self, latency_budget_ms=None, stocks=None, days=None, repeats=3):
+        settings = CONFIG.get('query_plans', {})
+        self.latency_budget_ms = latency_budget_ms or settings.get('latency_budget_ms', 50)
+        self.stocks = stocks or settings.get('synthetic_stocks', 500)
+        self.days = days or settings.get('synthetic_days', 750)
+        self.allow_seq_scan = set(settings.get('allow_seq_scan', ['dim_stocks', 'dim_sectors']))
+        self.portfolio_symbols = settings.get('portfolio_symbols', 50)
+        self.portfolio_years = settings.get('portfolio_years', 2)
+        self.repeats = repeats
+
+    def queries(self):
+        """(sql, params) per check: dashboard queries, a full read of every view, analytics loaders"""
+        checks = {name: (sql, None) for name, sql in ALL_QUERIES.items()}
+        for view in VIEWS:
+            checks[f'view:{view}'] = (f"SELECT * FROM {view}", None)
+
+        lookbacks = CONFIG.get('analytics', {}).get('correlation_lookbacks', [60])
+        today = date.today()
+        step = max(self.stocks // self.portfolio_symbols, 1)
+        symbols = [f"SYN{i:05d}.N0000" for i in range(1, self.stocks + 1, step)][:self.portfolio_symbols]
+        checks['analytics:correlation_closes'] = (
+            pyformat(CLOSES_SQL), {'end_date': today, 'num_dates': max(lookbacks) + 1}
+        )
+        checks['analytics:portfolio_prices'] = (pyformat(PRICES_SQL), {
+            'symbols': symbols,
+            'start_date': today - timedelta(days=365 * self.portfolio_years),
+            'end_date': today
+        })
+        return checks
+
+    def explain(self, cursor, sql, params=None):
+        """Run EXPLAIN ANALYZE repeatedly; keep the fastest run"""
+        best = None
+        for _ in range(self.repeats):
+            cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}", params)
+            result = cursor.fetchone()[0]
+            result = (json.loads(result) if isinstance(result, str) else result)[0]
+            if best is None or result['Execution Time'] < best['Execution Time']:
+                best = result
+        return best
+
+    def analyze_plan(self, name, explained):
+        """Summarize one plan and decide pass/fail"""
+        root = explained['Plan']
+        nodes = list(walk(root))
+        seq_scans = sorted({
+            n['Relation Name'] for n in nodes
+            if n['Node Type'] == 'Seq Scan' and n['Relation Name'] not in self.allow_seq_scan
+        })
+        latency = explained['Execution Time']
+
+        problems = []
+        if seq_scans:
+            problems.append(f"sequential scan on {', '.join(seq_scans)}")
+        if latency > self.latency_budget_ms:
+            problems.append(f"{latency:.1f} ms exceeds budget of {self.latency_budget_ms} ms")
+
+        return {
+            'query': name,
+            'passed': not problems,
+            'problems': problems,
+            'shape': plan_shape(root),
+            'execution_ms': round(latency, 3),
+            'planning_ms': round(explained.get('Planning Time', 0), 3),
+            'shared_hit_blocks': root.get('Shared Hit Blocks', 0),
+            'shared_read_blocks': root.get('Shared Read Blocks', 0),
+            'seq_scans': seq_scans
+        }
+
+    def suggest_indexes(self, explained):
+        """Composite index suggestions: equality filter columns, then sort keys, then range columns.
+
+        Applies to fact/aggregate tables that are either sequentially scanned
+        or whose rows are sorted after the scan.
+        """
+        nodes = list(walk(explained['Plan']))
+        sort_keys = [key for n in nodes if n['Node Type'] in ('Sort', 'Incremental Sort') for key in n.get('Sort Key', [])]
+
+        suggestions = []
+        for node in nodes:
+            table = node.get('Relation Name')
+            if node['Node Type'] not in SCAN_NODES or not table or table in self.allow_seq_scan:
+                continue
+            alias = node.get('Alias', table)
+            conditions = ' AND '.join(filter(None, (node.get(k) for k in ('Filter', 'Index Cond', 'Recheck Cond'))))
+            equality, ranges = condition_columns(conditions, alias)
+
+            sorted_columns = []
+            for key in sort_keys:
+                match = re.match(rf"(?:{re.escape(alias)}\.)?(\w+)", key)
+                if match and (key.startswith(f"{alias}.") or '.' not in key.split()[0]):
+                    sorted_columns.append(match.group(1))
+            sorted_columns = [c for c in sorted_columns if c not in equality]
+
+            if node['Node Type'] != 'Seq Scan' and not sorted_columns:
+                continue
+            columns = equality + sorted_columns + [c for c in ranges if c not in equality + sorted_columns]
+            if columns:
+                suggestions.append((table, tuple(columns)))
+        return suggestions
+
+    def existing_indexes(self, cursor):
+        """Leading column lists of existing indexes, per table"""
+        cursor.execute("SELECT tablename, indexdef FROM pg_indexes WHERE schemaname = 'public'")
+        existing = {}
+        for table, indexdef in cursor.fetchall():
+            columns = re.search(r"\((.*)\)", indexdef).group(1)
+            existing.setdefault(table, []).append(tuple(c.strip().split()[0] for c in columns.split(',')))
+        return existing
+
+    def run(self, baseline_path=None, report_dir='data/query_plans'):
+        """Run the suite; returns the report dict (report['passed'] is the overall result)"""
+        logger.info(f"Checking query plans on {self.stocks} synthetic stocks x {self.days} days...")
+
+        baseline = {}
+        if baseline_path and os.path.exists(baseline_path):
+            with open(baseline_path) as f:
+                baseline = {r['query']: r for r in json.load(f)['results']}
+
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(SYNTHETIC_DATA_SQL, {'stocks': self.stocks, 'days': self.days})
+            existing = self.existing_indexes(cursor)
+
+            results, suggestions = [], {}
+            for name, (sql, params) in self.queries().items():
+                explained = self.explain(cursor, sql, params)
+                result = self.analyze_plan(name, explained)
+
+                previous = baseline.get(name)
+                if previous and previous['shape'] != result['shape']:
+                    result['shape_changed_from'] = previous['shape']
+                results.append(result)
+
+                for table, columns in self.suggest_indexes(explained):
+                    if any(index[:len(columns)] == columns for index in existing.get(table, [])):
+                        continue
+                    suggestions.setdefault((table, columns), []).append(name)
+
+                status = 'OK' if result['passed'] else 'FAIL'
+                logger.info(f"{status} {name}: {result['execution_ms']} ms, {result['shape']}")
+                for problem in result['problems']:
+                    logger.warning(f"{name}: {problem}")
+            cursor.close()
+        finally:
+            conn.rollback()
+            conn.close()
+
+        report = {
+            'run_at': datetime.now().isoformat(timespec='seconds'),
+            'synthetic_stocks': self.stocks,
+            'synthetic_days': self.days,
+            'latency_budget_ms': self.latency_budget_ms,
+            'passed': all(r['passed'] for r in results),
+            'results': results,
+            'suggested_indexes': [
+                {
+                    'sql': f"CREATE INDEX idx_{table}_{'_'.join(columns)} ON {table}({', '.join(columns)});",
+                    'queries': names
+                }
+                for (table, columns), names in suggestions.items()
+            ]
+        }
+
+        os.makedirs(report_dir, exist_ok=True)
+        report_path = os.path.join(report_dir, f"report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+        with open(report_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        report['report_path'] = report_path
+
+        for suggestion in report['suggested_indexes']:
+            logger.info(f"Suggested: {suggestion['sql']} (for {', '.join(suggestion['queries'])})")
+        logger.info(f"Query plan check {'passed' if report['passed'] else 'FAILED'}; report at {report_path}")
+        return report
@@ -1,4 +1,5 @@
 """Loaders package"""
 from .data_loader import DataLoader
+from .rolling_stats import RollingStatsUpdater
 
-__all__ = ['DataLoader']
+__all__ = ['DataLoader', 'RollingStatsUpdater']
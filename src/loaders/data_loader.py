@@ -1,6 +1,7 @@
 """Data Loader - Error-Free with UPSERT"""
 from datetime import datetime
-from src.utils import get_logger, get_db_connection
+from src.utils import get_logger, get_db_connection, log_context
+from .rolling_stats import RollingStatsUpdater
 
 logger = get_logger(__name__)
 
@@ -171,6 +172,7 @@ class DataLoader:
                     float(row['price_change']),
                     float(row['price_change_pct'])
                 ))
+                logger.debug("Upserted %s %s", row['symbol'], row['trade_date'], extra={'per_row': True})
             
             conn.commit()
             cursor.close()
@@ -261,10 +263,18 @@ class DataLoader:
         total = 0
         
         try:
-            total += self.load_market_indices(data['market_indices'])
-            total += self.load_market_summary(data['market_summary'])
-            total += self.load_stock_prices(data['stock_prices'])
-            total += self.load_sector_performance(data['sector_performance'])
+            with log_context(table='fact_market_indices'):
+                total += self.load_market_indices(data['market_indices'])
+            with log_context(table='fact_market_summary'):
+                total += self.load_market_summary(data['market_summary'])
+            with log_context(table='fact_daily_prices'):
+                total += self.load_stock_prices(data['stock_prices'])
+            with log_context(table='fact_sector_performance'):
+                total += self.load_sector_performance(data['sector_performance'])
+            
+            if len(data['stock_prices']) > 0:
+                with log_context(table='agg_rolling_stats'):
+                    RollingStatsUpdater().update(data['stock_prices']['trade_date'].unique())
             
             exec_time = int((datetime.now() - start).total_seconds())
             self.log_execution('SUCCESS', total, exec_time)
@@ -0,0 +1,263 @@
+"""Rolling Statistics - Incremental per-symbol window updates"""
+from datetime import datetime, timedelta
+from src.utils import get_logger, get_db_connection
+
+logger = get_logger(__name__)
+
+WINDOWS = (20, 50, 200)
+RETURN_WINDOW = 20
+YEAR_DAYS = 365
+
+STATE_COLUMNS = (
+    ['as_of_date', 'obs_count', 'last_close',
+     'high_52w', 'high_52w_date', 'low_52w', 'low_52w_date']
+    + [f'sum_volume_{n}' for n in WINDOWS]
+    + [f'sum_close_{n}' for n in WINDOWS]
+    + ['close_20d_ago']
+)
+
+
+class RollingStatsUpdater:
+    """Maintains agg_rolling_stats from fact_daily_prices one trading day at a time.
+
+    Each day's update adds the new row to the running window sums and subtracts
+    the row that falls out of each window, so only a handful of indexed lookups
+    per symbol are needed. A symbol is rebuilt from history when its state is
+    missing, out of sequence (re-run or gap), or its 52-week extreme expires.
+    """
+
+    def get_state(self, cursor, stock_id):
+        """Get current rolling state for a stock as a dict"""
+        cursor.execute(
+            f"SELECT {', '.join(STATE_COLUMNS)} FROM agg_rolling_stats WHERE stock_id = %s",
+            (stock_id,)
+        )
+        row = cursor.fetchone()
+        return dict(zip(STATE_COLUMNS, row)) if row else None
+
+    def get_day(self, cursor, stock_id, trade_date):
+        """Get the price row being added to the windows"""
+        cursor.execute("""
+            SELECT close_price, high_price, low_price, volume
+            FROM fact_daily_prices
+            WHERE stock_id = %s AND trade_date = %s
+        """, (stock_id, trade_date))
+        return cursor.fetchone()
+
+    def get_dropped(self, cursor, stock_id, trade_date):
+        """Get the prior rows that leave each window when trade_date is added.
+
+        Returns {rank: (trade_date, close_price, volume)} for ranks 1 (the
+        previous trading day) and each window length, counting back from the
+        day before trade_date.
+        """
+        ranks = sorted({1, RETURN_WINDOW} | set(WINDOWS))
+        cursor.execute("""
+            SELECT rn, trade_date, close_price, volume FROM (
+                SELECT trade_date, close_price, volume,
+                       ROW_NUMBER() OVER (ORDER BY trade_date DESC) AS rn
+                FROM fact_daily_prices
+                WHERE stock_id = %s AND trade_date < %s
+                ORDER BY trade_date DESC
+                LIMIT %s
+            ) prior
+            WHERE rn = ANY(%s)
+        """, (stock_id, trade_date, max(ranks), ranks))
+        return {row[0]: row[1:] for row in cursor.fetchall()}
+
+    def compute_state(self, cursor, stock_id, trade_date):
+        """Full recompute of the rolling state from history (slow path)"""
+        year_start = trade_date - timedelta(days=YEAR_DAYS)
+        window_sums = ',\n'.join(
+            f"SUM(volume) FILTER (WHERE rn <= {n}), SUM(close_price) FILTER (WHERE rn <= {n})"
+            for n in WINDOWS
+        )
+        cursor.execute(f"""
+            WITH hist AS (
+                SELECT trade_date, close_price, high_price, low_price, volume,
+                       ROW_NUMBER() OVER (ORDER BY trade_date DESC) AS rn
+                FROM fact_daily_prices
+                WHERE stock_id = %(stock_id)s AND trade_date <= %(as_of)s
+            )
+            SELECT
+                COUNT(*),
+                MAX(close_price) FILTER (WHERE rn = 1),
+                (ARRAY_AGG(high_price ORDER BY high_price DESC, trade_date DESC)
+                    FILTER (WHERE trade_date > %(year_start)s))[1],
+                (ARRAY_AGG(trade_date ORDER BY high_price DESC, trade_date DESC)
+                    FILTER (WHERE trade_date > %(year_start)s))[1],
+                (ARRAY_AGG(low_price ORDER BY low_price ASC, trade_date DESC)
+                    FILTER (WHERE trade_date > %(year_start)s))[1],
+                (ARRAY_AGG(trade_date ORDER BY low_price ASC, trade_date DESC)
+                    FILTER (WHERE trade_date > %(year_start)s))[1],
+                {window_sums},
+                MAX(close_price) FILTER (WHERE rn = %(return_rank)s)
+            FROM hist
+        """, {
+            'stock_id': stock_id,
+            'as_of': trade_date,
+            'year_start': year_start,
+            'return_rank': RETURN_WINDOW + 1
+        })
+        row = cursor.fetchone()
+        if not row or not row[0]:
+            return None
+
+        count, last_close, high, high_date, low, low_date = row[:6]
+        sums = row[6:6 + 2 * len(WINDOWS)]
+        state = {
+            'as_of_date': trade_date,
+            'obs_count': count,
+            'last_close': last_close,
+            'high_52w': high,
+            'high_52w_date': high_date,
+            'low_52w': low,
+            'low_52w_date': low_date,
+            'close_20d_ago': row[-1]
+        }
+        for i, n in enumerate(WINDOWS):
+            state[f'sum_volume_{n}'] = sums[2 * i] or 0
+            state[f'sum_close_{n}'] = sums[2 * i + 1] or 0
+        return state
+
+    def advance_state(self, state, day, dropped, trade_date):
+        """Roll an existing state forward by one trading day (fast path).
+
+        Returns None when the 52-week extreme has expired and the caller must
+        fall back to a full recompute.
+        """
+        close, high, low, volume = day
+        year_start = trade_date - timedelta(days=YEAR_DAYS)
+
+        new = dict(state)
+        new['as_of_date'] = trade_date
+        new['obs_count'] = state['obs_count'] + 1
+        new['last_close'] = close
+
+        for n in WINDOWS:
+            new[f'sum_volume_{n}'] = state[f'sum_volume_{n}'] + volume
+            new[f'sum_close_{n}'] = state[f'sum_close_{n}'] + close
+            if n in dropped:
+                _, old_close, old_volume = dropped[n]
+                new[f'sum_volume_{n}'] -= old_volume
+                new[f'sum_close_{n}'] -= old_close
+
+        new['close_20d_ago'] = dropped[RETURN_WINDOW][1] if RETURN_WINDOW in dropped else None
+
+        if state['high_52w_date'] is None or state['high_52w_date'] <= year_start:
+            return None
+        if state['low_52w_date'] is None or state['low_52w_date'] <= year_start:
+            return None
+        if high >= state['high_52w']:
+            new['high_52w'], new['high_52w_date'] = high, trade_date
+        if low <= state['low_52w']:
+            new['low_52w'], new['low_52w_date'] = low, trade_date
+        return new
+
+    def save_state(self, cursor, stock_id, state):
+        """UPSERT rolling state and derived averages"""
+        averages = {}
+        for n in WINDOWS:
+            denom = min(state['obs_count'], n)
+            averages[f'avg_volume_{n}'] = float(state[f'sum_volume_{n}']) / denom
+            averages[f'avg_close_{n}'] = float(state[f'sum_close_{n}']) / denom
+
+        return_pct = None
+        if state['close_20d_ago']:
+            return_pct = (float(state['last_close']) / float(state['close_20d_ago']) - 1) * 100
+
+        values = {**state, **averages, 'return_20d_pct': return_pct}
+        columns = list(STATE_COLUMNS) + list(averages) + ['return_20d_pct']
+        cursor.execute(f"""
+            INSERT INTO agg_rolling_stats (stock_id, {', '.join(columns)}, updated_at)
+            VALUES (%s, {', '.join(['%s'] * len(columns))}, %s)
+            ON CONFLICT (stock_id)
+            DO UPDATE SET
+                {', '.join(f'{c} = EXCLUDED.{c}' for c in columns)},
+                updated_at = EXCLUDED.updated_at
+        """, [stock_id] + [values[c] for c in columns] + [datetime.now()])
+
+    def update_stock(self, cursor, stock_id, trade_date):
+        """Update one stock for one trading day, incrementally where possible"""
+        state = self.get_state(cursor, stock_id)
+        day = self.get_day(cursor, stock_id, trade_date)
+        if day is None:
+            return False
+
+        new_state = None
+        if state and state['as_of_date'] < trade_date:
+            dropped = self.get_dropped(cursor, stock_id, trade_date)
+            previous = dropped.get(1)
+            # Only roll forward if the state ends exactly on the previous trading day
+            if previous and previous[0] == state['as_of_date']:
+                new_state = self.advance_state(state, day, dropped, trade_date)
+
+        if new_state is None:
+            if state and state['as_of_date'] > trade_date:
+                # Late-arriving history: recompute as of the latest date we already hold
+                trade_date = state['as_of_date']
+            new_state = self.compute_state(cursor, stock_id, trade_date)
+
+        if new_state is None:
+            return False
+        self.save_state(cursor, stock_id, new_state)
+        return True
+
+    def update(self, trade_dates):
+        """Update rolling stats for every stock priced on the given trade dates"""
+        logger.info("Updating rolling statistics...")
+
+        conn = None
+        updated = 0
+        try:
+            conn = get_db_connection()
+            cursor = conn.cursor()
+
+            for trade_date in sorted(set(trade_dates)):
+                cursor.execute(
+                    "SELECT stock_id FROM fact_daily_prices WHERE trade_date = %s ORDER BY stock_id",
+                    (trade_date,)
+                )
+                for (stock_id,) in cursor.fetchall():
+                    if self.update_stock(cursor, stock_id, trade_date):
+                        updated += 1
+
+            conn.commit()
+            cursor.close()
+            conn.close()
+            logger.info(f"Updated rolling statistics for {updated} stock-days")
+            return updated
+        except Exception as e:
+            if conn:
+                conn.rollback()
+                conn.close()
+            logger.error(f"Error updating rolling statistics: {e}")
+            raise
+
+    def rebuild_all(self):
+        """Recompute rolling stats for all stocks from full history"""
+        logger.info("Rebuilding rolling statistics...")
+
+        conn = None
+        try:
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            cursor.execute("SELECT stock_id, MAX(trade_date) FROM fact_daily_prices GROUP BY stock_id")
+            rows = cursor.fetchall()
+
+            for stock_id, last_date in rows:
+                state = self.compute_state(cursor, stock_id, last_date)
+                if state:
+                    self.save_state(cursor, stock_id, state)
+
+            conn.commit()
+            cursor.close()
+            conn.close()
+            logger.info(f"Rebuilt rolling statistics for {len(rows)} stocks")
+            return len(rows)
+        except Exception as e:
+            if conn:
+                conn.rollback()
+                conn.close()
+            logger.error(f"Error rebuilding rolling statistics: {e}")
+            raise
@@ -1,6 +1,27 @@
-"""Utils package"""
-from .database import db_manager, get_db_connection, get_engine
-from .logger import setup_logging, get_logger
-from .config import load_config, CONFIG
+"""Utils package
 
-__all__ = ['db_manager', 'get_db_connection', 'get_engine', 'setup_logging', 'get_logger', 'load_config', 'CONFIG']
+Logging helpers are imported eagerly (stdlib only). Database and config
+helpers are resolved on first access, so importing src.utils does not pull
+in psycopg2, SQLAlchemy, dotenv or YAML for commands that never use them.
+"""
+import importlib
+from .logger import setup_logging, shutdown_logging, get_logger, log_context, new_run_id
+
+_LAZY = {
+    'db_manager': 'database',
+    'get_db_connection': 'database',
+    'get_engine': 'database',
+    'load_config': 'config',
+    'load_env': 'config',
+    'CONFIG': 'config'
+}
+
+__all__ = ['db_manager', 'get_db_connection', 'get_engine', 'setup_logging', 'shutdown_logging', 'get_logger', 'log_context', 'new_run_id', 'load_config', 'load_env', 'CONFIG']
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        value = getattr(importlib.import_module(f'.{_LAZY[name]}', __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
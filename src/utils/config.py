@@ -1,11 +1,26 @@
 """Config loader"""
-import yaml
+
+_env_loaded = False
 
 def load_config():
+    import yaml
     try:
         with open('config/config.yaml', 'r') as f:
             return yaml.safe_load(f)
     except:
         return {}
 
-CONFIG = load_config()
+def load_env():
+    """Load .env once (dotenv is only imported when needed)"""
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_loaded = True
+
+def __getattr__(name):
+    # CONFIG is read from disk on first access rather than at import time
+    if name == 'CONFIG':
+        value = globals()['CONFIG'] = load_config()
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
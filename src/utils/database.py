@@ -1,27 +1,33 @@
 """Database utilities - Simplified"""
 import os
-import psycopg2
-from sqlalchemy import create_engine
-from dotenv import load_dotenv
-
-load_dotenv()
+from .config import load_env
 
 class DatabaseManager:
     def __init__(self):
-        self.db_config = {
-            'host': os.getenv('DB_HOST', 'localhost'),
-            'port': os.getenv('DB_PORT', '5432'),
-            'database': os.getenv('DB_NAME', 'cse_intelligence'),
-            'user': os.getenv('DB_USER', 'postgres'),
-            'password': os.getenv('DB_PASSWORD', '')
-        }
+        self._db_config = None
+    
+    @property
+    def db_config(self):
+        """Connection settings, read from the environment on first use"""
+        if self._db_config is None:
+            load_env()
+            self._db_config = {
+                'host': os.getenv('DB_HOST', 'localhost'),
+                'port': os.getenv('DB_PORT', '5432'),
+                'database': os.getenv('DB_NAME', 'cse_intelligence'),
+                'user': os.getenv('DB_USER', 'postgres'),
+                'password': os.getenv('DB_PASSWORD', '')
+            }
+        return self._db_config
     
     def get_connection(self):
         """Get a new database connection"""
+        import psycopg2
         return psycopg2.connect(**self.db_config)
     
     def get_engine(self):
         """Get SQLAlchemy engine"""
+        from sqlalchemy import create_engine
         conn_str = (
             f"postgresql://{self.db_config['user']}:{self.db_config['password']}"
             f"@{self.db_config['host']}:{self.db_config['port']}/{self.db_config['database']}"
@@ -1,24 +1,195 @@
-"""Simple logging setup"""
+"""Logging setup - queue-based, structured, with run context"""
+import atexit
+import contextvars
+import copy
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import random
+import uuid
+from contextlib import contextmanager
 from datetime import datetime
+from .config import load_env
+
+CONTEXT_FIELDS = ('run_id', 'stage', 'table')
+
+_context = contextvars.ContextVar('log_context', default={})
+_listener = None
+
+
+class ContextFilter(logging.Filter):
+    """Stamps run_id/stage/table from the current log context onto each record"""
+
+    def filter(self, record):
+        context = _context.get()
+        for field in CONTEXT_FIELDS:
+            if not hasattr(record, field):
+                setattr(record, field, context.get(field))
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a fraction of records per level, e.g. {'DEBUG': 0.01}.
+
+    Records logged with extra={'per_row': True} use the 'PER_ROW' rate instead,
+    so per-row messages in loader/extractor loops can be thinned out without
+    losing stage-level messages. WARNING and above are never dropped.
+    """
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        key = 'PER_ROW' if getattr(record, 'per_row', False) else record.levelname
+        rate = self.rates.get(key, 1.0)
+        return rate >= 1.0 or random.random() < rate
+
+
+class ContextQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that keeps exc_info for the listener's formatters.
+
+    The stock prepare() folds the traceback into the message and clears
+    exc_info, which would leave the JSON 'exception' field empty. Records stay
+    in-process, so only the message arguments need merging here.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with the run context fields"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Console format with context appended when set"""
+
+    def __init__(self):
+        super().__init__('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    def format(self, record):
+        text = super().format(record)
+        context = ' '.join(f"{f}={getattr(record, f)}" for f in CONTEXT_FIELDS[1:] if getattr(record, f, None))
+        return f"{text} [{context}]" if context else text
+
+
+def _parse_rates(value):
+    """Parse 'DEBUG=0.01,PER_ROW=0.1' into a dict"""
+    rates = {}
+    for part in filter(None, (value or '').split(',')):
+        level, _, rate = part.partition('=')
+        rates[level.strip().upper()] = float(rate)
+    return rates
+
+
+def setup_logging(level=None, log_format=None, use_queue=None):
+    """Configure root logging.
+
+    By default records are handed to a queue and written by a background
+    listener thread, so callers never block on disk or console I/O. The log
+    file rotates by size and is JSON lines unless LOG_FORMAT=text.
+    Settings come from LOG_LEVEL, LOG_FORMAT, LOG_QUEUE, LOG_MAX_BYTES,
+    LOG_BACKUP_COUNT and LOG_SAMPLE_RATES (e.g. "DEBUG=0.01,PER_ROW=0.1").
+    """
+    global _listener
+
+    load_env()
+    level = (level or os.getenv('LOG_LEVEL', 'INFO')).upper()
+    log_format = log_format or os.getenv('LOG_FORMAT', 'json')
+    if use_queue is None:
+        use_queue = os.getenv('LOG_QUEUE', 'true').lower() not in ('0', 'false', 'no')
 
-def setup_logging():
     log_dir = 'logs'
     if not os.path.exists(log_dir):
         os.makedirs(log_dir)
-    
+
     log_file = os.path.join(log_dir, f"cse_etl_{datetime.now().strftime('%Y%m%d')}.log")
-    
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(log_file, encoding='utf-8'),
-            logging.StreamHandler()
-        ]
+
+    file_handler = logging.handlers.RotatingFileHandler(
+        log_file,
+        maxBytes=int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024)),
+        backupCount=int(os.getenv('LOG_BACKUP_COUNT', 5)),
+        encoding='utf-8'
     )
+    file_handler.setFormatter(JsonFormatter() if log_format == 'json' else TextFormatter())
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(TextFormatter())
+    handlers = [file_handler, console_handler]
+
+    root = logging.getLogger()
+    if _listener:
+        _listener.stop()
+        _listener = None
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+    root.setLevel(level)
+
+    filters = [ContextFilter(), SamplingFilter(_parse_rates(os.getenv('LOG_SAMPLE_RATES')))]
+
+    if use_queue:
+        queue_handler = ContextQueueHandler(queue.SimpleQueue())
+        for f in filters:
+            queue_handler.addFilter(f)
+        root.addHandler(queue_handler)
+        _listener = logging.handlers.QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+        _listener.start()
+    else:
+        for handler in handlers:
+            for f in filters:
+                handler.addFilter(f)
+            root.addHandler(handler)
+
     return logging.getLogger(__name__)
 
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
+
+
+@contextmanager
+def log_context(**fields):
+    """Attach run_id/stage/table to every record logged inside the block"""
+    token = _context.set({**_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def new_run_id():
+    return uuid.uuid4().hex[:12]
+
+
 def get_logger(name):
     return logging.getLogger(name)